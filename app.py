@@ -5,6 +5,7 @@ Render対応版（デバッグ強化 + 遅延初期化 + ヘルスチェック
 """
 
 from flask import Flask, request, render_template, jsonify, session
+from flask.json.provider import DefaultJSONProvider
 from openai import OpenAI
 import os
 import httpx
@@ -17,18 +18,118 @@ from pathlib import Path
 import secrets
 from datetime import datetime
 import re
+import time
+import queue
+import threading
+import hashlib
+import sqlite3
+import json
+import io
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import lru_cache
+from collections import OrderedDict
+from PIL import Image
 
 # WeasyPrintは無効（ブラウザ印刷で代用）
 WEASYPRINT_AVAILABLE = False
 
+# BLAKE3が無ければ標準ライブラリのBLAKE2でハッシュする
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
+# pybase64（SIMD版）が無ければ標準のbase64を使う
+try:
+    import pybase64
+    PYBASE64_AVAILABLE = True
+except ImportError:
+    PYBASE64_AVAILABLE = False
+
+# h2 が入っていれば httpx で HTTP/2 を使う（並列リクエストを1本の接続に多重化）
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# orjson が無ければ標準の json を使う
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def json_loads(s):
+    """JSON文字列をパース（orjsonがあればそちらで）"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(s)
+    return json.loads(s)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify などFlaskのJSON処理をorjsonで行う"""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+        return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        # object_hook 等が指定された場合（セッションのタグ復元など）は標準実装に任せる
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
 app.secret_key = os.environ.get("SECRET_KEY", secrets.token_hex(16))
 app.config["MAX_CONTENT_LENGTH"] = 100 * 1024 * 1024  # 100MB制限
+UPLOAD_COPY_BUFSIZE = 1024 * 1024  # アップロード保存時のバッファ（1MB）
+
+# 分析ジョブ（/analyze はジョブを投入して即座に返し、/analyze/<job_id> で結果を取りにくる）
+# ジョブはプロセス内で保持するため、Gunicornはワーカー1プロセスで動かす前提
+ANALYZE_JOB_WORKERS = max(1, int(os.environ.get("ANALYZE_JOB_WORKERS", "4")))
+JOBS_MAX = 100  # 保持する完了済みジョブの上限
+JOBS = OrderedDict()  # job_id -> Future
+_jobs_lock = threading.Lock()
+_job_executor = ThreadPoolExecutor(max_workers=ANALYZE_JOB_WORKERS, thread_name_prefix="analyze-job")
+
+# 分析レポート（セッションCookieにはIDだけ入れ、本体はサーバー側に置く）
+REPORTS_MAX = 100
+REPORTS = OrderedDict()  # report_id -> final_report
+_reports_lock = threading.Lock()
+
+# フレーム分析の同時実行数（OpenAIのTierごとのレート制限に合わせて調整）
+# 同時に走るジョブ全体で共有する上限（ジョブごとではない）
+ANALYZE_CONCURRENCY = max(1, int(os.environ.get("ANALYZE_CONCURRENCY", "10")))
+_frame_executor = ThreadPoolExecutor(max_workers=ANALYZE_CONCURRENCY, thread_name_prefix="frame-analyze")
+# 最初の一斉送信をずらす間隔（秒）。全リクエストが同じタイミングで衝突しないように
+ANALYZE_STAGGER = max(0.0, float(os.environ.get("ANALYZE_STAGGER", "0.05")))
+# FFmpegから先読みしておくフレーム数（分析が詰まったらFFmpeg側を待たせる）
+ANALYZE_PREFETCH = max(1, int(os.environ.get("ANALYZE_PREFETCH", "16")))
+# 1回のVisionリクエストにまとめるフレーム数（1で従来どおり1枚ずつ）
+ANALYZE_BATCH_SIZE = max(1, int(os.environ.get("ANALYZE_BATCH_SIZE", "4")))
+# 分析済みフレームとのdHashのハミング距離がこの値以下なら分析を省いて結果を流用（負の値で無効）
+DEDUP_MAX_DISTANCE = int(os.environ.get("DEDUP_MAX_DISTANCE", "5"))
+# フレーム分析結果のキャッシュ（SQLite）。空文字で無効化
+FRAME_CACHE_PATH = os.environ.get(
+    "FRAME_CACHE_PATH", os.path.join(tempfile.gettempdir(), "video-analysis-frame-cache.sqlite3")
+)
 
 # OpenAI クライアント（Gunicornワーカーごとにメモリ独立）
 client = None
 last_openai_init_error = None
 
+_WS_RE = re.compile(r"\s+")
+
+# /healthz の ffmpeg チェック結果キャッシュ: (確認時刻, 結果)
+FFMPEG_PROBE_TTL = 60.0
+_ffmpeg_ok_cache = None
+
 
 def _sanitize_api_key(raw: str) -> str:
     """
@@ -44,12 +145,13 @@ def _sanitize_api_key(raw: str) -> str:
     if (len(s) >= 2) and ((s[0] == s[-1]) and s[0] in ("'", '"')):
         s = s[1:-1]
     # 中に紛れた空白類を除去
-    s = re.sub(r"\s+", "", s)
+    s = _WS_RE.sub("", s)
     return s
 
 
+@lru_cache(maxsize=1)
 def get_api_key() -> str:
-    """環境変数 → （ローカルのみ）.env の順で読む"""
+    """環境変数 → （ローカルのみ）.env の順で読む（結果はキャッシュ、init_openaiで再読込）"""
     raw = os.environ.get("OPENAI_API_KEY", "")
     api_key = _sanitize_api_key(raw)
 
@@ -68,6 +170,19 @@ def get_api_key() -> str:
     return api_key
 
 
+# 接続ウォームアップの待ち時間上限（起動や最初の/analyzeを長く止めないよう短めに）
+OPENAI_WARMUP_TIMEOUT = 5.0
+
+
+def _warm_openai_connection():
+    """軽いAPI呼び出しで接続プールを温めておく（失敗しても初期化は成功扱い）"""
+    try:
+        client.with_options(max_retries=0, timeout=OPENAI_WARMUP_TIMEOUT).models.list()
+        print("✅ OpenAI 接続ウォームアップ完了")
+    except Exception as e:
+        print(f"⚠️ OpenAI 接続ウォームアップ失敗: {type(e).__name__}: {e}")
+
+
 def init_openai(force: bool = False) -> bool:
     """OpenAI クライアントを初期化（デバッグ強化版）"""
     global client, last_openai_init_error
@@ -75,6 +190,8 @@ def init_openai(force: bool = False) -> bool:
     if client is not None and not force:
         return True
 
+    # 初期化し直すときは環境変数から読み直す
+    get_api_key.cache_clear()
     api_key = get_api_key()
 
     # デバッグ情報（キー本体は出さない）
@@ -96,9 +213,15 @@ def init_openai(force: bool = False) -> bool:
         return False
 
     try:
-        client = OpenAI(api_key=api_key,http_client=httpx.Client(timeout=60.0),)
+        http_client = httpx.Client(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+        )
+        client = OpenAI(api_key=api_key, http_client=http_client)
         last_openai_init_error = None
-        print("✅ OpenAI クライアント初期化成功")
+        print(f"✅ OpenAI クライアント初期化成功 (HTTP/2: {HTTP2_AVAILABLE})")
+        _warm_openai_connection()
         return True
     except Exception as e:
         client = None
@@ -109,105 +232,565 @@ def init_openai(force: bool = False) -> bool:
         return False
 
 
+# Visionに送るフレームの最大幅（px）
+FRAME_MAX_WIDTH = 768
+# FFmpegのハードウェアデコード（空文字で無効化）
+FFMPEG_HWACCEL = os.environ.get("FFMPEG_HWACCEL", "auto")
+
+_JPEG_SOI = b"\xff\xd8"
+_JPEG_EOI = b"\xff\xd9"
+
+
+def _frame_input_args(video_path):
+    """フレーム抽出用の入力オプション（パイプ/ディスク共通）"""
+    args = []
+    if FFMPEG_HWACCEL:
+        args += ["-hwaccel", FFMPEG_HWACCEL]
+    # 壊れたパケットは捨てて続行する
+    return args + ["-fflags", "+discardcorrupt", "-i", video_path]
+
+
+def _frame_output_args(interval):
+    """
+    フレーム抽出用の出力オプション（パイプ/ディスク共通）
+    Visionは低解像度（detail=low）で処理するので、FFmpeg側で縮小してから軽めにエンコードする
+    """
+    return [
+        "-vf", f"fps=1/{interval},scale='min({FRAME_MAX_WIDTH},iw)':-2:flags=fast_bilinear",
+        "-q:v", "5",
+        "-threads", "0",
+        "-an",  # 音声は使わないのでデコードしない
+    ]
+
+
 def extract_frames(video_path, output_dir, interval=1.0):
-    """FFmpegで動画からフレーム抽出"""
+    """FFmpegで動画からフレーム抽出（ディスク書き出し版・フォールバック用）"""
     cmd = [
         "ffmpeg",
-        "-i", video_path,
-        "-vf", f"fps=1/{interval}",
-        "-q:v", "2",
+        *_frame_input_args(video_path),
+        *_frame_output_args(interval),
         f"{output_dir}/frame_%04d.jpg",
     ]
     subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
 
 
-def encode_image_to_base64(image_path):
-    """画像をbase64エンコード"""
-    with open(image_path, "rb") as f:
-        return base64.b64encode(f.read()).decode("utf-8")
+def _read_file_bytes(path):
+    """ファイルサイズ分をos.readで直接読み込む（バッファ付きIOを経由しない）"""
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        data = os.read(fd, os.fstat(fd).st_size)
+        # 通常ファイルなら1回で読み切れるが、念のため短い読み込みに備える
+        while True:
+            rest = os.read(fd, 1 << 16)
+            if not rest:
+                return data
+            data += rest
+    finally:
+        os.close(fd)
+
+
+def _iter_frames_from_disk(video_path, interval):
+    """一時ディレクトリにJPEGを書き出してから順に読み込む"""
+    frames_dir = tempfile.mkdtemp()
+    try:
+        extract_frames(video_path, frames_dir, interval)
+        for frame_path in sorted(Path(frames_dir).glob("frame_*.jpg")):
+            yield _read_file_bytes(frame_path)
+    finally:
+        shutil.rmtree(frames_dir, ignore_errors=True)
 
 
-def analyze_frame(image_path, frame_number, interval):
-    """OpenAI Visionでフレームを分析"""
+def iter_frames(video_path, interval=1.0):
+    """
+    FFmpegの標準出力（MJPEGストリーム）からフレームをJPEGのbytesで1枚ずつ返す。
+    SOI/EOIマーカーで区切れなかった場合はディスク書き出しに切り替える。
+    """
+    cmd = [
+        "ffmpeg",
+        *_frame_input_args(video_path),
+        *_frame_output_args(interval),
+        "-f", "image2pipe",
+        "-vcodec", "mjpeg",
+        "pipe:1",
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+    buf = bytearray()
+    count = 0
+    finished = False
+    try:
+        while True:
+            chunk = proc.stdout.read(1 << 16)
+            if not chunk:
+                break
+            buf += chunk
+            while True:
+                start = buf.find(_JPEG_SOI)
+                if start < 0:
+                    # マーカーがチャンク境界で分断されている可能性があるので末尾1バイトは残す
+                    del buf[:-1]
+                    break
+                end = buf.find(_JPEG_EOI, start + 2)
+                if end < 0:
+                    del buf[:start]
+                    break
+                yield bytes(buf[start:end + 2])
+                count += 1
+                del buf[:end + 2]
+        finished = True
+    finally:
+        proc.stdout.close()
+        # 途中で打ち切られた場合はFFmpegを止める
+        if not finished and proc.poll() is None:
+            proc.kill()
+        proc.wait()
+
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+    if count == 0:
+        print("⚠️ パイプからフレームを取り出せなかったため、ディスク書き出しで再試行します")
+        yield from _iter_frames_from_disk(video_path, interval)
+
+
+_JPEG_DATA_URL_PREFIX = b"data:image/jpeg;base64,"
+
+
+def encode_image_to_data_url(image_bytes):
+    """画像をbase64のdata URLに変換（bytesのまま連結し、str化は最後の1回だけ）"""
+    if PYBASE64_AVAILABLE:
+        encoded = pybase64.b64encode(image_bytes)
+    else:
+        encoded = base64.b64encode(image_bytes)
+    return (_JPEG_DATA_URL_PREFIX + encoded).decode("ascii")
+
+
+_frame_cache_conn = None
+_frame_cache_lock = threading.Lock()
+_frame_cache_writes = 0
+FRAME_CACHE_MAX_ROWS = 20000  # これを超えたら古いものから削除
+FRAME_CACHE_PRUNE_EVERY = 100  # 何回書き込むごとに件数を確認するか
+
+
+@lru_cache(maxsize=None)
+def _frame_cache_namespace(model, prompt, max_tokens):
+    """モデル・指示文・出力上限ごとの短いハッシュ（どれかが変われば古い結果は使われない）"""
+    params = f"{model}\0{prompt}\0{max_tokens}".encode("utf-8")
+    return f"{model}:{hashlib.blake2b(params, digest_size=6).hexdigest()}"
+
+
+def frame_cache_key(jpeg_bytes, model, prompt):
+    """JPEGのbytesからキャッシュキー（モデル・指示文・出力上限のハッシュ + 内容ハッシュ）を作る"""
+    if BLAKE3_AVAILABLE:
+        digest = blake3.blake3(jpeg_bytes).hexdigest()
+    else:
+        digest = hashlib.blake2b(jpeg_bytes, digest_size=32).hexdigest()
+    return f"{_frame_cache_namespace(model, prompt, FRAME_MAX_TOKENS)}:{digest}"
+
+
+def _get_frame_cache():
+    """SQLite接続を遅延生成（Gunicornのfork後に各ワーカーで開く）"""
+    global _frame_cache_conn
+    if _frame_cache_conn is None:
+        conn = sqlite3.connect(FRAME_CACHE_PATH, timeout=5.0, check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS frame_results "
+            "(key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS frame_results_created_at ON frame_results (created_at)")
+        conn.commit()
+        _frame_cache_conn = conn
+    return _frame_cache_conn
+
+
+def frame_cache_get(key):
+    """キャッシュ済みの分析結果を返す（無ければNone）"""
+    if not FRAME_CACHE_PATH:
+        return None
+    try:
+        with _frame_cache_lock:
+            row = _get_frame_cache().execute(
+                "SELECT content FROM frame_results WHERE key = ?", (key,)
+            ).fetchone()
+    except sqlite3.Error as e:
+        print(f"⚠️ フレームキャッシュ読み込みエラー: {e}")
+        return None
+    return row[0] if row else None
+
+
+def frame_cache_set(key, content):
+    """分析結果をキャッシュに保存（失敗しても分析自体は続行）"""
+    global _frame_cache_writes
+    if not FRAME_CACHE_PATH:
+        return
+    try:
+        with _frame_cache_lock:
+            conn = _get_frame_cache()
+            conn.execute(
+                "INSERT OR REPLACE INTO frame_results (key, content, created_at) VALUES (?, ?, ?)",
+                (key, content, time.time()),
+            )
+            _frame_cache_writes += 1
+            if _frame_cache_writes % FRAME_CACHE_PRUNE_EVERY == 0:
+                conn.execute(
+                    "DELETE FROM frame_results WHERE key IN "
+                    "(SELECT key FROM frame_results ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (FRAME_CACHE_MAX_ROWS,),
+                )
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"⚠️ フレームキャッシュ書き込みエラー: {e}")
+
+
+# フレーム分析は1行の短い出力なので軽量モデル、最終レポートのみ gpt-4o を使う
+# ※ detail=low の画像入力は gpt-4o-mini だと1枚あたり約2833トークン（gpt-4oは85）として課金されるため、
+#   画像入力のコストは mini の方が高くなる。コスト優先なら FRAME_MODEL=gpt-4o を指定する
+FRAME_MODEL = os.environ.get("FRAME_MODEL", "gpt-4o-mini")
+REPORT_MODEL = "gpt-4o"
+FRAME_MAX_TOKENS = 60  # 1フレームあたりの出力上限
+# バッチ応答のJSON枠（{"results": [...]}）と、1件ごとのクォート・カンマ分の余裕
+FRAME_BATCH_JSON_OVERHEAD_TOKENS = 16
+FRAME_BATCH_ITEM_OVERHEAD_TOKENS = 4
+
+# フレーム分析1回あたりのタイムアウト（秒）とリトライ回数
+FRAME_TIMEOUT = float(os.environ.get("FRAME_TIMEOUT", "15"))
+FRAME_MAX_RETRIES = 2
+# この秒数を過ぎても返らないリクエストは同じ内容をもう1本投げ、先に返った方を使う（0で無効）
+FRAME_HEDGE_AFTER = max(0.0, float(os.environ.get("FRAME_HEDGE_AFTER", "8")))
+# 実際のAPI呼び出しを行うスレッド。呼び出し元は _frame_executor のワーカー（ANALYZE_CONCURRENCY本）だけで、
+# それぞれ元リクエスト＋予備リクエストの最大2本を使うので、キュー待ちが発生しない本数を確保する
+_vision_call_executor = ThreadPoolExecutor(
+    max_workers=ANALYZE_CONCURRENCY * 2, thread_name_prefix="vision-call"
+)
+
+# フレーム分析の指示文。サーバー側のプロンプトキャッシュが効くよう、
+# タイムスタンプなどのリクエストごとの値は埋め込まず常に同じ文字列を送る
+_FRAME_PROMPT = (
+    "この画像を分析して、以下の形式で1行で簡潔に答えてください：\n"
+    "内容: [何が映っているか] | テキスト: [画像内のテキスト、なければ「なし」]"
+)
+_FRAME_BATCH_PROMPT = (
+    "以下の画像はすべて同じ動画のフレームです。画像ごとに、以下の形式で1行で簡潔に分析してください：\n"
+    "内容: [何が映っているか] | テキスト: [画像内のテキスト、なければ「なし」]\n\n"
+    "画像と同じ順番・同じ件数で、次のJSON形式で回答してください：\n"
+    '{"results": ["1枚目の分析結果", "2枚目の分析結果", ...]}'
+)
+
+
+def frame_dhash(jpeg_bytes, hash_size=8):
+    """JPEGの差分ハッシュ（dHash, hash_size**2 ビット）。デコードできなければNone"""
+    try:
+        with Image.open(io.BytesIO(jpeg_bytes)) as img:
+            # JPEGは縮小デコードできるので、必要な大きさ近くまで落としてから読む
+            img.draft("L", (hash_size * 8, hash_size * 8))
+            small = img.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+            pixels = list(small.getdata())
+    except Exception:
+        return None
+
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def _frame_timestamp(frame_number, interval):
+    """フレーム番号から (表示用 "MM:SS.s", 秒) を返す"""
     timestamp = frame_number * interval
     minutes = int(timestamp // 60)
     seconds = timestamp % 60
-    time_str = f"{minutes:02d}:{seconds:04.1f}"
+    return f"{minutes:02d}:{seconds:04.1f}", timestamp
+
+
+def _frame_image_part(jpeg_bytes):
+    """Visionに渡す image_url パート"""
+    return {
+        "type": "image_url",
+        "image_url": {"url": encode_image_to_data_url(jpeg_bytes), "detail": "low"},
+    }
 
-    base64_image = encode_image_to_base64(image_path)
+
+def _create_frame_completion(**kwargs):
+    """
+    フレーム分析用の chat.completions 呼び出し（タイムアウト・リトライ付き）。
+    FRAME_HEDGE_AFTER秒以内に返らなければ予備リクエストを投げ、先に成功した方を返す。
+    """
+    frame_client = client.with_options(timeout=FRAME_TIMEOUT, max_retries=FRAME_MAX_RETRIES)
+
+    def call(started):
+        started.set()
+        return frame_client.chat.completions.create(**kwargs)
+
+    if not FRAME_HEDGE_AFTER:
+        return call(threading.Event())
+
+    # 予備リクエストまでの待ち時間は、キュー待ちを含めず実際に呼び出しが始まってから数える
+    primary_started = threading.Event()
+    primary = _vision_call_executor.submit(call, primary_started)
+    primary_started.wait()
+    done, pending = wait({primary}, timeout=FRAME_HEDGE_AFTER)
+    if not done:
+        pending.add(_vision_call_executor.submit(call, threading.Event()))
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
+        error = None
+        while True:
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            if not pending:
+                raise error
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+    finally:
+        # まだ始まっていない方は取り消す（実行中のものはタイムアウトまで走る）
+        for future in pending:
+            future.cancel()
+
+
+def analyze_frame(jpeg_bytes, frame_number, interval, model=FRAME_MODEL):
+    """OpenAI Visionでフレームを分析"""
+    time_str, timestamp = _frame_timestamp(frame_number, interval)
+
+    cache_key = frame_cache_key(jpeg_bytes, model, _FRAME_PROMPT)
+    cached = frame_cache_get(cache_key)
+    if cached is not None:
+        return {"timestamp": time_str, "time_seconds": timestamp, "content": cached}
+
+    try:
+        response = _create_frame_completion(
+            model=model,
             messages=[
                 {
                     "role": "user",
                     "content": [
                         {
                             "type": "text",
-                            "text": "この画像を分析して、以下の形式で1行で簡潔に答えてください：\n内容: [何が映っているか] | テキスト: [画像内のテキスト、なければ「なし」]"
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
+                            "text": _FRAME_PROMPT,
                         },
+                        _frame_image_part(jpeg_bytes),
                     ],
                 }
             ],
-            max_tokens=100,
+            max_tokens=FRAME_MAX_TOKENS,
         )
 
         result = response.choices[0].message.content.strip()
+        frame_cache_set(cache_key, result)
         return {"timestamp": time_str, "time_seconds": timestamp, "content": result}
 
     except Exception as e:
-        return {"timestamp": time_str, "time_seconds": timestamp, "content": f"エラー: {str(e)}"}
+        return {"timestamp": time_str, "time_seconds": timestamp, "content": f"エラー: {str(e)}", "error": True}
 
 
-def generate_final_report(frame_results):
-    """全フレームから最終レポート生成"""
-    frames_summary = "\n".join([f"{r['timestamp']} | {r['content']}" for r in frame_results])
-    total_duration = frame_results[-1]["time_seconds"] if frame_results else 0
+def analyze_frame_batch(batch, interval, model=FRAME_MODEL):
+    """
+    複数フレームを1回のリクエストでまとめて分析する。
+    batch は [(フレーム番号, JPEG bytes), ...]。返り値は batch と同じ順番の結果リスト。
+    件数が合わない等で解釈できなかった場合は1枚ずつの分析に切り替える。
+    """
+    results = {}
+    misses = []
+    for frame_number, jpeg_bytes in batch:
+        cache_key = frame_cache_key(jpeg_bytes, model, _FRAME_BATCH_PROMPT)
+        cached = frame_cache_get(cache_key)
+        if cached is None:
+            # バッチ失敗時などに1枚ずつ分析した結果も使う
+            cached = frame_cache_get(frame_cache_key(jpeg_bytes, model, _FRAME_PROMPT))
+        if cached is None:
+            misses.append((frame_number, jpeg_bytes, cache_key))
+        else:
+            time_str, timestamp = _frame_timestamp(frame_number, interval)
+            results[frame_number] = {"timestamp": time_str, "time_seconds": timestamp, "content": cached}
+
+    if len(misses) == 1:
+        frame_number, jpeg_bytes, _ = misses[0]
+        results[frame_number] = analyze_frame(jpeg_bytes, frame_number, interval, model)
+    elif misses:
+        contents = None
+        try:
+            response = _create_frame_completion(
+                model=model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": _FRAME_BATCH_PROMPT,
+                            },
+                            *[_frame_image_part(jpeg_bytes) for _, jpeg_bytes, _ in misses],
+                        ],
+                    }
+                ],
+                response_format={"type": "json_object"},
+                max_tokens=(
+                    (FRAME_MAX_TOKENS + FRAME_BATCH_ITEM_OVERHEAD_TOKENS) * len(misses)
+                    + FRAME_BATCH_JSON_OVERHEAD_TOKENS
+                ),
+            )
+            choice = response.choices[0]
+            # 上限で打ち切られたJSONはパースできないので、その旨を出して1枚ずつに切り替える
+            if choice.finish_reason == "length":
+                raise ValueError("出力がmax_tokensで打ち切られました")
+            contents = json_loads(choice.message.content).get("results")
+        except Exception as e:
+            print(f"⚠️ バッチ分析エラー（1枚ずつ再試行します）: {e}")
+
+        if isinstance(contents, list) and len(contents) == len(misses):
+            for (frame_number, _, cache_key), content in zip(misses, contents):
+                content = str(content).strip()
+                frame_cache_set(cache_key, content)
+                time_str, timestamp = _frame_timestamp(frame_number, interval)
+                results[frame_number] = {"timestamp": time_str, "time_seconds": timestamp, "content": content}
+        else:
+            for frame_number, jpeg_bytes, _ in misses:
+                results[frame_number] = analyze_frame(jpeg_bytes, frame_number, interval, model)
+
+    return [results[frame_number] for frame_number, _ in batch]
+
+
+def analyze_video_frames(video_path, interval=1.0):
+    """
+    フレーム抽出とVision分析を重ねて実行する。
+    FFmpeg読み出しスレッド → 上限付きキュー → 分析スレッドプール（ANALYZE_BATCH_SIZE枚ずつ） → index順に回収
+    見た目がほぼ同じフレーム（dHashが近いもの）は分析せず、キーフレームの結果を流用する。
+    """
+    read_q = queue.Queue(maxsize=ANALYZE_PREFETCH)
+    reader_errors = []
 
-    prompt = f"""以下は動画の各フレーム分析結果です（総尺: {total_duration:.1f}秒）：
+    def reader():
+        try:
+            for i, jpeg_bytes in enumerate(iter_frames(video_path, interval), start=1):
+                dhash = frame_dhash(jpeg_bytes) if DEDUP_MAX_DISTANCE >= 0 else None
+                read_q.put((i, jpeg_bytes, dhash))
+        except Exception as e:
+            reader_errors.append(e)
+        finally:
+            read_q.put(None)  # 終端
+
+    threading.Thread(target=reader, name="frame-reader", daemon=True).start()
+
+    # このジョブが投入するバッチ数を同時実行数までに抑え、あふれた分はキューで待たせる
+    # （実際の同時実行数はプロセス共有の _frame_executor で制限される）
+    slots = threading.BoundedSemaphore(ANALYZE_CONCURRENCY)
+    futures = {}
+    seen = []  # 分析対象にしたキーフレーム: (dHash, フレーム番号)
+    duplicates = {}  # 流用するフレーム番号 -> (キーフレーム番号, JPEG bytes)
+
+    def on_done(future):
+        slots.release()
+        indices = futures[future]
+        print(f"  - #{indices[0]}〜#{indices[-1]} フレーム完了")
+
+    def submit(batch):
+        slots.acquire()
+        future = _frame_executor.submit(analyze_frame_batch, batch, interval)
+        futures[future] = [i for i, _ in batch]
+        future.add_done_callback(on_done)
+        # 初回の同時実行分だけ送信タイミングをずらす（以降は完了順に自然とばらける）
+        if len(futures) < ANALYZE_CONCURRENCY and ANALYZE_STAGGER:
+            time.sleep(ANALYZE_STAGGER)
+
+    batch = []
+    while True:
+        item = read_q.get()
+        if item is None:
+            break
+        i, jpeg_bytes, dhash = item
+        # ほぼ同じ見た目のフレームが分析済みならVisionを呼ばずにその結果を流用する
+        if dhash is not None:
+            nearest = min(seen, key=lambda kf: (dhash ^ kf[0]).bit_count(), default=None)
+            if nearest is not None and (dhash ^ nearest[0]).bit_count() <= DEDUP_MAX_DISTANCE:
+                duplicates[i] = (nearest[1], jpeg_bytes)
+                continue
+            seen.append((dhash, i))
+        batch.append((i, jpeg_bytes))
+        if len(batch) >= ANALYZE_BATCH_SIZE:
+            submit(batch)
+            batch = []
+    if batch:
+        submit(batch)
+    wait(list(futures))
+
+    if reader_errors:
+        raise reader_errors[0]
+
+    results_by_index = {}
+    for future, indices in futures.items():
+        results_by_index.update(zip(indices, future.result()))
+    # キーフレームの分析が失敗していた場合はエラーを広げないよう、そのフレーム自身を分析し直す
+    retry = []
+    for i, (key_index, jpeg_bytes) in duplicates.items():
+        if results_by_index[key_index].get("error"):
+            retry.append((i, jpeg_bytes))
+            continue
+        time_str, timestamp = _frame_timestamp(i, interval)
+        content = results_by_index[key_index]["content"]
+        results_by_index[i] = {"timestamp": time_str, "time_seconds": timestamp, "content": content}
+    if retry:
+        print(f"🔁 キーフレームの分析に失敗した類似フレーム{len(retry)}枚を個別に分析")
+        retry_futures = {
+            _frame_executor.submit(analyze_frame_batch, retry[n:n + ANALYZE_BATCH_SIZE], interval):
+                [i for i, _ in retry[n:n + ANALYZE_BATCH_SIZE]]
+            for n in range(0, len(retry), ANALYZE_BATCH_SIZE)
+        }
+        for future, indices in retry_futures.items():
+            results_by_index.update(zip(indices, future.result()))
+    if len(duplicates) > len(retry):
+        print(f"♻️ 類似フレーム{len(duplicates) - len(retry)}枚は分析結果を流用")
+    return [results_by_index[i] for i in sorted(results_by_index)]
 
-{frames_summary}
 
-この動画を分析して、以下の形式でJSON形式で回答してください：
+# 最終レポートの回答形式の指示（固定部分。インポート時に1回だけ組み立てる）
+_REPORT_INSTRUCTIONS = """この動画を分析して、以下の形式でJSON形式で回答してください：
 
-{{
+{
   "genre": "動画のジャンル（例: ビジネス解説系、Vlog、ゲーム実況など）",
   "genre_confidence": "判定の信頼度（パーセント、数値のみ）",
   "genre_reason": "このジャンルと判定した理由（1-2文）",
   "parts": [
-    {{"name": "Aパート", "timerange": "0:00-0:15", "summary": "このパートの内容要約"}},
-    {{"name": "Bパート", "timerange": "0:15-0:30", "summary": "このパートの内容要約"}},
-    {{"name": "Cパート", "timerange": "0:30-0:45", "summary": "このパートの内容要約"}},
-    {{"name": "Dパート", "timerange": "0:45-1:00", "summary": "このパートの内容要約"}}
+    {"name": "Aパート", "timerange": "0:00-0:15", "summary": "このパートの内容要約"},
+    {"name": "Bパート", "timerange": "0:15-0:30", "summary": "このパートの内容要約"},
+    {"name": "Cパート", "timerange": "0:30-0:45", "summary": "このパートの内容要約"},
+    {"name": "Dパート", "timerange": "0:45-1:00", "summary": "このパートの内容要約"}
   ],
   "advice": [
-    {{"title": "1. カット編集", "content": "具体的なアドバイス（4-6行程度）"}},
-    {{"title": "2. テロップ戦略", "content": "具体的なアドバイス"}},
-    {{"title": "3. BGM・効果音", "content": "具体的なアドバイス"}},
-    {{"title": "4. 視覚効果", "content": "具体的なアドバイス"}},
-    {{"title": "5. サムネイル設計", "content": "具体的なアドバイス"}},
-    {{"title": "6. 構成の改善", "content": "具体的なアドバイス"}},
-    {{"title": "7. トレンド対応", "content": "このジャンルの最新トレンド"}}
+    {"title": "1. カット編集", "content": "具体的なアドバイス（4-6行程度）"},
+    {"title": "2. テロップ戦略", "content": "具体的なアドバイス"},
+    {"title": "3. BGM・効果音", "content": "具体的なアドバイス"},
+    {"title": "4. 視覚効果", "content": "具体的なアドバイス"},
+    {"title": "5. サムネイル設計", "content": "具体的なアドバイス"},
+    {"title": "6. 構成の改善", "content": "具体的なアドバイス"},
+    {"title": "7. トレンド対応", "content": "このジャンルの最新トレンド"}
   ]
-}}
+}
 
 動画を4つのパートに均等分割して、各パートの内容をまとめてください。
 編集アドバイスは、このジャンルに特化した実践的で具体的な内容にしてください。"""
 
+
+def generate_final_report(frame_results):
+    """全フレームから最終レポート生成"""
+    total_duration = frame_results[-1]["time_seconds"] if frame_results else 0
+
+    # 各パーツをバッファに直接書き込み、最後に1回だけ文字列化する
+    buf = io.StringIO()
+    buf.write(f"以下は動画の各フレーム分析結果です（総尺: {total_duration:.1f}秒）：\n\n")
+    buf.writelines(f"{r['timestamp']} | {r['content']}\n" for r in frame_results)
+    buf.write("\n")
+    buf.write(_REPORT_INSTRUCTIONS)
+    prompt = buf.getvalue()
+
     try:
         response = client.chat.completions.create(
-            model="gpt-4o",
+            model=REPORT_MODEL,
             messages=[{"role": "user", "content": prompt}],
             response_format={"type": "json_object"},
             max_tokens=2000,
         )
-        import json
-        return json.loads(response.choices[0].message.content)
+        return json_loads(response.choices[0].message.content)
 
     except Exception as e:
         return {
@@ -219,6 +802,23 @@ def generate_final_report(frame_results):
         }
 
 
+def ffmpeg_available() -> bool:
+    """ffmpegが実行できるか（ヘルスチェック毎にプロセスを起動しないようTTL付きでキャッシュ）"""
+    global _ffmpeg_ok_cache
+    now = time.monotonic()
+    if _ffmpeg_ok_cache is not None and now - _ffmpeg_ok_cache[0] < FFMPEG_PROBE_TTL:
+        return _ffmpeg_ok_cache[1]
+
+    ffmpeg_ok = True
+    try:
+        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    except Exception:
+        ffmpeg_ok = False
+
+    _ffmpeg_ok_cache = (now, ffmpeg_ok)
+    return ffmpeg_ok
+
+
 @app.route("/")
 def index():
     return render_template("index.html", weasyprint_available=WEASYPRINT_AVAILABLE)
@@ -227,12 +827,7 @@ def index():
 @app.route("/healthz")
 def healthz():
     """Renderログ以外でも最低限の状態確認ができるように"""
-    ffmpeg_ok = True
-    try:
-        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-    except Exception:
-        ffmpeg_ok = False
-
+    ffmpeg_ok = ffmpeg_available()
     api_key = get_api_key()
     return jsonify({
         "ok": True,
@@ -244,9 +839,60 @@ def healthz():
     })
 
 
+def _run_analysis(video_path, temp_dir):
+    """バックグラウンドで動画を分析し、/analyze/<job_id> で返す内容を作る"""
+    try:
+        print("🎞️ フレーム抽出・分析中...")
+        frame_results = analyze_video_frames(video_path, interval=1.0)
+        if not frame_results:
+            return {"error": "フレームが抽出できませんでした"}
+
+        print("✅ フレーム分析完了")
+        print("📊 最終レポート生成中...")
+        final_report = generate_final_report(frame_results)
+
+        report_id = store_report(final_report)
+
+        print("✅ 分析完了")
+        return {
+            "success": True,
+            "total_frames": len(frame_results),
+            "report": final_report,
+            "report_id": report_id,
+        }
+
+    except Exception as e:
+        print(f"❌ エラー: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise
+
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def store_report(report):
+    """レポートを保存してIDを返す（古いものから捨てて REPORTS_MAX 件に収める）"""
+    report_id = secrets.token_urlsafe(8)
+    with _reports_lock:
+        REPORTS[report_id] = report
+        while len(REPORTS) > REPORTS_MAX:
+            REPORTS.popitem(last=False)
+    return report_id
+
+
+def _prune_jobs():
+    """古い完了済みジョブから捨てて JOBS_MAX 件に収める（実行中のものは残す）"""
+    for job_id in list(JOBS):
+        if len(JOBS) <= JOBS_MAX:
+            break
+        if JOBS[job_id].done():
+            del JOBS[job_id]
+
+
 @app.route("/analyze", methods=["POST"])
 def analyze():
-    """動画分析のメインエンドポイント（遅延初期化）"""
+    """動画分析のメインエンドポイント（遅延初期化）。分析はバックグラウンドで行い job_id を返す"""
     # ここで毎回「未初期化なら初期化」を試す（Renderの再起動/環境変数反映漏れに強くなる）
     if client is None:
         init_openai()
@@ -266,48 +912,52 @@ def analyze():
         return jsonify({"error": "動画ファイルが選択されていません"}), 400
 
     temp_dir = tempfile.mkdtemp()
-    frames_dir = tempfile.mkdtemp()
 
     try:
         video_path = os.path.join(temp_dir, "video.mp4")
-        video.save(video_path)
+        # 1MBずつ直接書き出す（アップロード全体をメモリに載せない）
+        with open(video_path, "wb") as f:
+            shutil.copyfileobj(video.stream, f, length=UPLOAD_COPY_BUFSIZE)
         print(f"📹 動画を保存: {video_path}")
 
-        print("🎞️ フレーム抽出中...")
-        extract_frames(video_path, frames_dir, interval=1.0)
+        job_id = secrets.token_hex(8)
+        with _jobs_lock:
+            JOBS[job_id] = _job_executor.submit(_run_analysis, video_path, temp_dir)
+            _prune_jobs()
+        print(f"🧵 分析ジョブ開始: {job_id}")
+        return jsonify({"job_id": job_id}), 202
 
-        frames = sorted(Path(frames_dir).glob("frame_*.jpg"))
-        if not frames:
-            return jsonify({"error": "フレームが抽出できませんでした"}), 500
-
-        print(f"✅ {len(frames)}フレームを抽出")
-        print("🔍 フレーム分析中...")
+    except Exception as e:
+        print(f"❌ エラー: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return jsonify({"error": str(e)}), 500
 
-        frame_results = []
-        for i, frame_path in enumerate(frames, start=1):
-            print(f"  - {i}/{len(frames)} フレーム処理中...")
-            result = analyze_frame(str(frame_path), i, 1.0)
-            frame_results.append(result)
 
-        print("✅ フレーム分析完了")
-        print("📊 最終レポート生成中...")
-        final_report = generate_final_report(frame_results)
+@app.route("/analyze/<job_id>")
+def analyze_status(job_id):
+    """分析ジョブの状態確認（完了していれば結果も返す）"""
+    with _jobs_lock:
+        future = JOBS.get(job_id)
 
-        session["last_report"] = final_report
-        session["analysis_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if future is None:
+        return jsonify({"error": "分析ジョブが見つかりません"}), 404
 
-        print("✅ 分析完了")
-        return jsonify({"success": True, "total_frames": len(frames), "report": final_report})
+    if not future.done():
+        return jsonify({"state": "running" if future.running() else "queued", "result": None})
 
+    try:
+        result = future.result()
     except Exception as e:
-        print(f"❌ エラー: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"state": "error", "error": str(e)}), 500
 
-    finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        shutil.rmtree(frames_dir, ignore_errors=True)
+    if "error" in result:
+        return jsonify({"state": "error", "error": result["error"]}), 500
+
+    session["last_report_id"] = result["report_id"]
+    session["analysis_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return jsonify({"state": "done", "result": result})
 
 
 @app.route("/pdf")
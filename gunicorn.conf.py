@@ -0,0 +1,15 @@
+"""
+Gunicorn設定
+フレーム分析はOpenAIへのI/O待ちが中心なので、スレッドワーカー（gthread）で同時に捌く
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
+# 分析ジョブはプロセス内で保持するので、ポーリングが同じプロセスに届くよう既定は1ワーカー
+workers = int(os.environ.get("GUNICORN_WORKERS", "1"))
+
+timeout = 600